@@ -22,6 +22,21 @@ describe("Task 1", () => {
       const response = await getTask1("");
       expect(response.status).toBe(400);
     });
+
+    it("leading and trailing separators", async () => {
+      const response = await getTask1("  skibidi___spaghetti-  ");
+      expect(response.body).toStrictEqual({ msg: "Skibidi Spaghetti" });
+    });
+
+    it("words without letters are dropped", async () => {
+      const response = await getTask1("abc 123");
+      expect(response.body).toStrictEqual({ msg: "Abc" });
+    });
+
+    it("error case - no letters", async () => {
+      const response = await getTask1("123 __ 456");
+      expect(response.status).toBe(400);
+    });
   });
 });
 
@@ -93,6 +108,29 @@ describe("Task 2", () => {
       });
       expect(resp3.status).toBe(400);
     });
+
+    it("Only strict JSON is accepted", async () => {
+      const resp = await request("http://localhost:8080")
+        .post("/entry")
+        .set("Content-Type", "application/json")
+        .send(
+          '{"type": "ingredient", "name": "N1234567890123456789", "cookTime": NaN}'
+        );
+      expect(resp.status).toBe(400);
+    });
+
+    it("UTF-16 encoded entry", async () => {
+      const body = JSON.stringify({
+        type: "ingredient",
+        name: "Utf16 Egg",
+        cookTime: 1,
+      });
+      const resp = await request("http://localhost:8080")
+        .post("/entry")
+        .set("Content-Type", "application/json")
+        .send(Buffer.from(body, "utf16le"));
+      expect(resp.status).toBe(200);
+    });
   });
 });
 
@@ -157,5 +195,142 @@ describe("Task 3", () => {
       const resp3 = await getTask3("Skibidi");
       expect(resp3.status).toBe(200);
     });
+
+    it("Shared ingredients are summed", async () => {
+      const entries = [
+        {
+          type: "recipe",
+          name: "Milk Pizza",
+          requiredItems: [
+            { name: "Milk Cheese", quantity: 3 },
+            { name: "Milk", quantity: 1 },
+          ],
+        },
+        {
+          type: "recipe",
+          name: "Milk Cheese",
+          requiredItems: [{ name: "Milk", quantity: 2 }],
+        },
+        { type: "ingredient", name: "Milk", cookTime: 3 },
+      ];
+      for (const entry of entries) {
+        const resp = await postEntry(entry);
+        expect(resp.status).toBe(200);
+      }
+
+      const resp = await getTask3("Milk Pizza");
+      expect(resp.status).toBe(200);
+      expect(resp.body).toStrictEqual({
+        name: "Milk Pizza",
+        cookTime: 21,
+        ingredients: [{ name: "Milk", quantity: 7 }],
+      });
+    });
+
+    it("Big quantities keep their precision", async () => {
+      const resp1 = await request("http://localhost:8080")
+        .post("/entry")
+        .set("Content-Type", "application/json")
+        .send(
+          '{"type": "ingredient", "name": "Big Bean", "cookTime": 1180591620717411303424}'
+        );
+      expect(resp1.status).toBe(200);
+
+      const resp2 = await postEntry({
+        type: "recipe",
+        name: "Big Stew",
+        requiredItems: [{ name: "Big Bean", quantity: 1 }],
+      });
+      expect(resp2.status).toBe(200);
+
+      const resp3 = await getTask3("Big Stew");
+      expect(resp3.status).toBe(200);
+      expect(resp3.text).toMatch(/"cookTime":\s*1180591620717411303424\b/);
+    });
+  });
+});
+
+describe("Task 3", () => {
+  describe("GET /summary caching", () => {
+    const postEntry = async (data) => {
+      return await request("http://localhost:8080").post("/entry").send(data);
+    };
+
+    const getTask3 = async (name, ifNoneMatch) => {
+      const req = request("http://localhost:8080").get(`/summary?name=${name}`);
+      if (ifNoneMatch !== undefined) {
+        req.set("If-None-Match", ifNoneMatch);
+      }
+      return await req;
+    };
+
+    const addBread = async () => {
+      const resp1 = await postEntry({
+        type: "ingredient",
+        name: "Etag Flour",
+        cookTime: 4,
+      });
+      expect(resp1.status).toBe(200);
+      const resp2 = await postEntry({
+        type: "recipe",
+        name: "Etag Bread",
+        requiredItems: [{ name: "Etag Flour", quantity: 2 }],
+      });
+      expect(resp2.status).toBe(200);
+    };
+
+    it("Repeat summaries are not modified", async () => {
+      await addBread();
+      const resp1 = await getTask3("Etag Bread");
+      expect(resp1.status).toBe(200);
+      const etag = resp1.headers["etag"];
+      expect(etag).toBeDefined();
+
+      const resp2 = await getTask3("Etag Bread", etag);
+      expect(resp2.status).toBe(304);
+
+      const resp3 = await getTask3("Etag Bread", `W/${etag}`);
+      expect(resp3.status).toBe(304);
+    });
+
+    it("Star tags do not skip validation", async () => {
+      const resp1 = await getTask3("nothing", "*");
+      expect(resp1.status).toBe(400);
+
+      const resp2 = await getTask3("Etag Flour", "*");
+      expect(resp2.status).toBe(400);
+
+      const resp3 = await getTask3("Etag Bread", "*");
+      expect(resp3.status).toBe(200);
+    });
+
+    it("New entries change the tag", async () => {
+      const resp1 = await getTask3("Etag Bread");
+      const etag = resp1.headers["etag"];
+
+      const resp2 = await postEntry({
+        type: "ingredient",
+        name: "Etag Salt",
+        cookTime: 1,
+      });
+      expect(resp2.status).toBe(200);
+
+      const resp3 = await getTask3("Etag Bread", etag);
+      expect(resp3.status).toBe(200);
+      expect(resp3.headers["etag"]).not.toBe(etag);
+    });
+
+    it("Clearing the cookbook changes the tag", async () => {
+      const resp1 = await getTask3("Etag Bread");
+      const etag = resp1.headers["etag"];
+
+      const resp2 = await request("http://localhost:8080").post("/clear");
+      expect(resp2.status).toBe(200);
+      await addBread();
+
+      const resp3 = await getTask3("Etag Bread", etag);
+      expect(resp3.status).toBe(200);
+      expect(resp3.headers["etag"]).not.toBe(etag);
+    });
   });
 });
@@ -1,42 +1,148 @@
 from dataclasses import dataclass
-from typing import List, Dict, Union
-from flask import Flask, request, jsonify
+from typing import Dict, Iterator, Tuple, Union
+from flask import Flask, Response, request
+from flask.json.provider import JSONProvider
+from functools import lru_cache
+import json
+import orjson
 import re
+import string
+import sys
+import threading
 
 # ==== Type Definitions, feel free to add or modify ===========================
-@dataclass
+@dataclass(slots=True)
 class CookbookEntry:
 	name: str
 
-@dataclass
-class RequiredItem():
-	name: str
-	quantity: int
-
-@dataclass
+# The required items are stored as two parallel tuples rather than a list of
+# (name, quantity) objects, so the summary traversal zips over two compact
+# sequences instead of chasing a pointer to an object per item
+@dataclass(slots=True)
 class Recipe(CookbookEntry):
-	required_items: List[RequiredItem]
+	required_names: Tuple[str, ...]
+	required_quantities: Tuple[int, ...]
 
-@dataclass
+@dataclass(slots=True)
 class Ingredient(CookbookEntry):
 	cook_time: int
 
+# A recipe paused on the summary dfs stack: its remaining (name, quantity)
+# pairs, the freq table and cook time accumulated so far, and the quantity
+# its parent requires of it
+@dataclass(slots=True)
+class SummaryFrame:
+	name: str
+	items: Iterator[Tuple[str, int]]
+	ingredient_freq: Dict[str, int]
+	quantity: int
+	cook_time: int
+
 
 # =============================================================================
 # ==== HTTP Endpoint Stubs ====================================================
 # =============================================================================
+# Route Flask's own JSON handling (request.get_json, jsonify) through orjson
+# instead of the stdlib json module
+class OrjsonProvider(JSONProvider):
+	def dumps(self, obj, **kwargs):
+		return _dumps(obj).decode()
+
+	def loads(self, s, **kwargs):
+		return _loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Serialise JSON bodies with orjson, which writes bytes directly and is much
+# faster than the stdlib encoder Flask uses by default. orjson only supports
+# 64-bit integers, and quantities multiply down recipe chains, so fall back to
+# the stdlib encoder for bodies it rejects
+def _dumps(obj):
+	try:
+		return orjson.dumps(obj)
+	except TypeError:
+		return json.dumps(obj, separators=(',', ':')).encode()
+
+# Parse request bodies with orjson, which is strict RFC 8259 and decides what
+# is accepted (so NaN, Infinity and lone surrogates are rejected). Like the
+# stdlib parser, bodies may be UTF-8, UTF-16 or UTF-32, with or without a BOM;
+# orjson only reads UTF-8, so anything else is re-encoded first.
+# orjson silently decodes integers beyond 64 bits as floats, while the stdlib
+# parser keeps them as ints. Any literal of 19 or more digits may be out of
+# range, so once orjson has accepted such a payload it is parsed again by the
+# stdlib for exact ints
+_BIG_INT_RE = re.compile(rb'\d{19}')
+
+def _loads(s):
+	if isinstance(s, str):
+		s = s.encode()
+	else:
+		encoding = json.detect_encoding(s)
+		if encoding != 'utf-8':
+			s = s.decode(encoding).encode()
+
+	obj = orjson.loads(s)
+	if _BIG_INT_RE.search(s):
+		return json.loads(s)
+	return obj
+
+def _json_response(obj, status=200):
+	return _json_body_response(_dumps(obj), status)
+
+def _json_body_response(body, status=200, etag=None):
+	response = Response(body, status=status, mimetype='application/json')
+	if etag is not None:
+		response.set_etag(etag)
+	return response
+
+# Split pattern used by parse_handwriting, compiled once rather than on every
+# call
+_SPLIT_RE = re.compile(r'[- _]+')
+
+# Deletion table used by parse_handwriting to keep only ASCII letters.
+# Hyphens and underscores are consumed by the split, so they never need to
+# survive. Letters map to themselves; code points outside latin-1 are not in
+# the prebuilt table and are deleted through __missing__ (str.translate treats
+# None as delete)
+class _DeletionTable(dict):
+	def __missing__(self, key):
+		return None
+
+_LETTERS = string.ascii_letters
+_DELETE_CHARS = bytes(
+	i for i in range(256) if not (65 <= i <= 90 or 97 <= i <= 122)
+).decode('latin-1')
+_DEL = _DeletionTable(str.maketrans(_LETTERS, _LETTERS, _DELETE_CHARS))
 
 # Store your recipes here!
-# Map the name of entry to its data (either a Recipe or an Ingredient)
-cookbook = {}
+# Map the name of entry to its data. Ingredients and recipes are kept in
+# separate tables so the summary traversal can dispatch on a membership test
+# instead of an isinstance check. Names are unique across both tables
+ingredients: Dict[str, Ingredient] = {}
+recipes: Dict[str, Recipe] = {}
 
 # We are under the assumption that recipe dependencies cannot be moditfied
 # upon creation. Hence, cache the time taken and freq for each recipe to avoid
 # repetitive computation => O(1) store and lookup
-# name to tuple {ingredient freq}
+# name to tuple ({ingredient freq}, total cook time)
 recipe_ingredient_cache = {}
 
+# For the same reason the /summary response of a recipe never changes once
+# computed, so keep its encoded JSON body
+# name to summary json bytes
+summary_cache = {}
+
+# The app is served by a threaded worker (see run.sh), so requests that read
+# and then write the cookbook or its caches hold this lock. Warm /summary
+# requests only read summary_cache and skip it
+cookbook_lock = threading.Lock()
+
+# Bumped on every successful /entry and /clear. Summaries are immutable for a
+# given cookbook version, so it doubles as the /summary ETag and lets repeat
+# clients of a cached summary get a 304 without the body being sent again
+cookbook_version = 0
+
 # Task 1 helper (don't touch)
 @app.route('/parse', methods=['POST'])
 def parse():
@@ -45,48 +151,59 @@ def parse():
 	parsed_name = parse_handwriting(recipe_name)
 	if parsed_name is None:
 		return 'invalid recipe name', 400
-	return jsonify({'msg': parsed_name}), 200
+	return _json_response({'msg': parsed_name})
 
 # [TASK 1] ====================================================================
 # Takes in a recipe_name and returns it in a form that 
+# The result only depends on the input string, so memoise it for repeated
+# requests with the same name
+@lru_cache(maxsize=4096)
 def parse_handwriting(recipe_name: str) -> Union[str | None]:
-	original_names = re.split(r'[- _]+', recipe_name)
+	updated_names = []
+	for name in _SPLIT_RE.split(recipe_name):
+		new_name = name.translate(_DEL)
+		# leading/trailing separators and words with no letters leave empty
+		# pieces behind, which would otherwise break the capitalisation
+		if new_name == '':
+			continue
+		new_name = new_name[0].upper() + new_name[1:].lower()
+		updated_names.append(new_name)
 
 	# error case
-	if len(original_names) == 0 or original_names[0] == '':
+	if len(updated_names) == 0:
 		return None
 
-	updated_names = []
-	for name in original_names:
-		new_name = re.sub(r'[^a-zA-Z_-]', '', name)
-		new_name = new_name[0].upper() + new_name[1:].lower()
-		updated_names.append(new_name)
-	
 	return ' '.join(updated_names)
 
 
 # [TASK 2] ====================================================================
 # This helper function creates a recipe
 def create_receipe(data, name):
-	item_names = set()
-	required_items = []
-	for item in data.get('requiredItems'):
-		# check that the item name is not repeated
-		item_name = item.get('name')
-		if item_name in item_names:
-			return 'can only have one element per name', 400 
-		item_names.add(item_name)
-
-		# check that quantity is valid
-		item_quantity = item.get('quantity')
-		if item_quantity < 0:
-			return 'invalid quantity', 400
-		
-		required_items.append(
-			RequiredItem(name=item_name, quantity=item_quantity)
-		)
-	recipe = Recipe(name=item_name, required_items=required_items)
-	cookbook[name] = recipe
+	items = data.get('requiredItems')
+	item_names = [item.get('name') for item in items]
+	# names must be checked before they are used as dict keys, since an
+	# unhashable name would otherwise raise
+	if not all(isinstance(item_name, str) for item_name in item_names):
+		return 'invalid item name', 400
+
+	# build the name -> quantity table, a repeated name collapses into a
+	# single key
+	pairs = dict(zip(item_names, [item.get('quantity') for item in items]))
+
+	# check that the item name is not repeated
+	if len(pairs) != len(items):
+		return 'can only have one element per name', 400
+
+	# check that quantity is valid
+	if any(item_quantity < 0 for item_quantity in pairs.values()):
+		return 'invalid quantity', 400
+
+	recipe = Recipe(
+		name=name,
+		required_names=tuple(map(sys.intern, pairs)),
+		required_quantities=tuple(pairs.values())
+	)
+	recipes[name] = recipe
 
 	return 'recipe added', 200
 
@@ -98,131 +215,221 @@ def create_ingredient(data, name):
 		return 'invalid cook time', 400
 	
 	ingredient = Ingredient(name=name, cook_time=cook_time)
-	cookbook[name] = ingredient
+	ingredients[name] = ingredient
 
 	return 'ingredient added', 200
 
 # Endpoint that adds a CookbookEntry to your magical cookbook
 @app.route('/entry', methods=['POST'])
 def create_entry():
+	global cookbook_version
 	data = request.get_json()
 	entry_type = data.get('type')
 	name = data.get('name')
+	if not isinstance(name, str):
+		return 'invalid name', 400
 
-	if name in cookbook:
-		return 'name of the entry must be unique', 400
+	# names are hashed and compared over and over during summaries, so intern
+	# them once here; dict lookups on the same object short-circuit on identity
+	name = sys.intern(name)
+	with cookbook_lock:
+		if name in ingredients or name in recipes:
+			return 'name of the entry must be unique', 400
 
-	# recipe case
-	if entry_type == 'recipe':
-		return create_receipe(data, name)
+		# recipe case
+		if entry_type == 'recipe':
+			message, status_code = create_receipe(data, name)
 
-	# ingredient case
-	elif entry_type == 'ingredient':
-		return create_ingredient(data, name)
+		# ingredient case
+		elif entry_type == 'ingredient':
+			message, status_code = create_ingredient(data, name)
 
-	# type does not match
-	else:
-		return 'invalid type', 400
+		# type does not match
+		else:
+			return 'invalid type', 400
+
+		if status_code == 200:
+			cookbook_version += 1
+		return message, status_code
 
 
 # [TASK 3] ====================================================================
-# This helper function recursively computes the summary requied
+# This helper function computes the summary requied
 # Note that ingredients are leaf nodes and we can cache the queries to each 
 # node since different recipes may depend on the same recipe and/or ingredient
 # We should also consider a case where recipes have circular dependencies via 
 # directed cycle check. Note that the name must be a type Recipe
-# each call returns {ingredient freq}.
+# each call returns ({ingredient freq}, total cook time).
+#
+# The dfs is a postorder traversal over an explicit stack rather than
+# recursion, which avoids a Python frame per recipe and cannot hit the
+# recursion limit on deep cookbooks. Each stack frame is a SummaryFrame.
+# curr_path holds the recipes currently on the stack (gray nodes); a recipe is
+# moved into recipe_ingredient_cache once all of its items are folded in
+# (black nodes).
 #
 # Time Complexity:
 # O(|recipes|*|ingredients|) since we must repeatedly aggregate the ingredients 
 # for uncached recipes since the quantites of which the ingredients are 
 # required may be different across different recipes. This is assuming dict 
 # and set are O(1) amortised
-def recursive_summary(name, curr_path):
-	# check that recipe exists in cookbook
-	if name in recipe_ingredient_cache:
-		return recipe_ingredient_cache[name], 200
-	
-	if name in curr_path:
-		return 'ciruclar dependencies of recipes', 400
-	curr_path.add(name)
+def compute_summary(name):
+	cached = recipe_ingredient_cache.get(name)
+	if cached is not None:
+		return cached, 200
 
-	# parent recipe's ingredient freq table
-	ingredient_freq = {}
-
-	# dfs neighbour search
-	for item in cookbook[name].required_items:
-		# check that item exists in cookbook
-		if not item.name in cookbook:
-			return 'item does not exist in cookbook', 400
+	# to detect circular dependencies of recipes
+	curr_path = {name}
+	root = recipes[name]
+	stack = [SummaryFrame(
+		name=name,
+		items=zip(root.required_names, root.required_quantities),
+		ingredient_freq={},
+		quantity=0,
+		cook_time=0
+	)]
+
+	while stack:
+		frame = stack[-1]
+		ingredient_freq = frame.ingredient_freq
+		freq_get = ingredient_freq.get
+
+		# dfs neighbour search, resumed from where this recipe was paused
+		for item_name, quantity in frame.items:
+			# case: item is a ingredient
+			# accumulate rather than assign, since a child recipe visited
+			# earlier may already have contributed this ingredient
+			# a single get both tests membership and fetches the entry
+			ingredient = ingredients.get(item_name)
+			if ingredient is not None:
+				ingredient_freq[item_name] = freq_get(item_name, 0) + quantity
+				frame.cook_time += ingredient.cook_time * quantity
+				continue
+
+			# case: item is a recipe that has already been summarised
+			cached = recipe_ingredient_cache.get(item_name)
+			if cached is not None:
+				child_freq, child_cook_time = cached
+				fold_freq(ingredient_freq, child_freq, quantity)
+				frame.cook_time += child_cook_time * quantity
+				continue
+
+			# check that item exists in cookbook
+			recipe = recipes.get(item_name)
+			if recipe is None:
+				return 'item does not exist in cookbook', 400
+
+			# case: item is an unvisited recipe, so pause this recipe and
+			# descend into the child first
+			if item_name in curr_path:
+				return 'ciruclar dependencies of recipes', 400
+			curr_path.add(item_name)
+			stack.append(SummaryFrame(
+				name=item_name,
+				items=zip(recipe.required_names, recipe.required_quantities),
+				ingredient_freq={},
+				quantity=quantity,
+				cook_time=0
+			))
+			break
+
+		# all items of this recipe have been visited
+		else:
+			stack.pop()
+			curr_path.remove(frame.name)
+			cook_time = frame.cook_time
+			recipe_ingredient_cache[frame.name] = (ingredient_freq, cook_time)
+			if stack:
+				parent = stack[-1]
+				fold_freq(
+					parent.ingredient_freq, ingredient_freq, frame.quantity
+				)
+				parent.cook_time += cook_time * frame.quantity
+
+	return recipe_ingredient_cache[name], 200
+
+# aggregate the child recipe's freq to the parent receipe's freq
+# takes O(#ingredients)
+# Note: to make it more efficient consider using threads
+# to divide up the work of aggregating
+#
+# When the parent has nothing to merge with yet (e.g. the child is its first
+# item) and the quantity is 1, the fold is a plain copy of the child
+def fold_freq(ingredient_freq, child_recipe, quantity):
+	if quantity == 1 and not ingredient_freq:
+		ingredient_freq.update(child_recipe)
+		return
 
-		# case: item is a ingredient
-		if isinstance(cookbook[item.name], Ingredient):
-			ingredient_freq[item.name] = item.quantity
+	freq_get = ingredient_freq.get
+	# make sure to mult by the quantity (edge weights)
+	for k, v in child_recipe.items():
+		ingredient_freq[k] = freq_get(k, 0) + quantity * v
 
-		# case: item is a recipe
-		else:
-			content, status_code = recursive_summary(item.name, curr_path)
-			# if error occurred, repeatedly return the error to caller
-			if status_code != 200:
-				message = content
-				return message, status_code 		
-
-			child_recipe = content
-			# aggregate the child recipe's freq to the parent receipe's freq
-			# takes O(#ingredients)
-			# Note: to make it more efficient consider using threads
-			# to divide up the work of aggregating
-			for k, v in child_recipe.items():
-				# make sure to mult by the quantity (edge weights)
-				if k in ingredient_freq:
-					ingredient_freq[k] += item.quantity * v
-				else:
-					ingredient_freq[k] = item.quantity * v
-
-	recipe_ingredient_cache[name] = ingredient_freq
-	curr_path.remove(name)
-	return ingredient_freq, 200
-	
 
 # Endpoint that returns a summary of a recipe that corresponds to a query name
 @app.route('/summary', methods=['GET'])
 def summary():
 	query = request.args
 	name = query.get('name')
-	if not name in cookbook:
-		return 'name not found in cook book', 400
-	elif not isinstance(cookbook[name], Recipe):
-		return 'type is not a recipe', 400
-	
-	# to detect circular dependencies of recipes
-	curr_path = set()
-	content, status_code = recursive_summary(name, curr_path)
-	# check for any errors that occurred in the recursion
+
+	# ETags are scoped to the request url, so the version alone identifies the
+	# summary
+	etag = str(cookbook_version)
+	body = summary_cache.get(name)
+	if body is not None:
+		# the client already holds the summary for this cookbook version.
+		# If-None-Match uses weak comparison, so W/ tags (e.g. as rewritten by
+		# a compressing proxy) count too. Only explicit tags do; a star tag
+		# would also match names that have no summary at all
+		if etag in request.if_none_match.as_set(include_weak=True):
+			response = Response(status=304)
+			response.set_etag(etag)
+			return response
+		return _json_body_response(body, etag=etag)
+
+	with cookbook_lock:
+		if name in ingredients:
+			return 'type is not a recipe', 400
+		elif not name in recipes:
+			return 'name not found in cook book', 400
+
+		content, status_code = compute_summary(name)
+	# check for any errors that occurred in the traversal
 	if status_code != 200:
 		message = content
 		return message, status_code
 
-	ingredient_freq = content
+	# the per-ingredient dicts are only built once per recipe, the encoded
+	# body is reused on every later request
+	ingredient_freq, cook_time = content
 	required_items = [
 		{"name": k, "quantity": v} for k, v in ingredient_freq.items()
 	]
-	cook_time = 0
-	for k, v in ingredient_freq.items():
-		cook_time += cookbook[k].cook_time * v
 
 	summary = {
 		"name": name, 
 		"cookTime": cook_time, 
 		"ingredients": required_items
 	}
-	
-	return summary, 200
+	body = _dumps(summary)
+	with cookbook_lock:
+		# a /clear (and a new entry with the same name) may have run since the
+		# summary was computed, so only store the body if it was built from the
+		# summary that is still cached
+		if recipe_ingredient_cache.get(name) is content:
+			summary_cache[name] = body
+
+	return _json_body_response(body, etag=etag)
 
 @app.route('/clear', methods=['POST'])
 def clear():
-	cookbook .clear()
-	recipe_ingredient_cache.clear()
+	global cookbook_version
+	with cookbook_lock:
+		cookbook_version += 1
+		ingredients.clear()
+		recipes.clear()
+		recipe_ingredient_cache.clear()
+		summary_cache.clear()
 	return 'clear cookbook success', 200
 
 # =============================================================================
@@ -13,7 +13,9 @@ source venv/bin/activate
 
 # Install dependencies and runs
 pip install -r requirements.txt
-python devdonalds.py
+# Serve with gunicorn rather than the Flask dev server. The cookbook lives in
+# process memory, so use a single worker and scale with threads instead
+gunicorn -w 1 -k gthread --threads 4 -b 127.0.0.1:8080 devdonalds:app
 
 trap cleanup EXIT
 